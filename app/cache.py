@@ -0,0 +1,112 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+import time
+
+import orjson
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from .config import settings
+
+# Cache odpowiedzi w Redis: hash {body, expires_at, stale_at}.
+# Wpis jest "świeży" do expires_at, a do stale_at służy jako fallback, gdy źródło nie odpowiada.
+_redis: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def close_redis() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
+def cache_key(name: str, **params: Any) -> str:
+    # klucz tylko ze zwalidowanych argumentów handlera – nieznane parametry z URL nie tworzą nowych wpisów
+    args = "&".join(f"{k}={'' if v is None else v}" for k, v in sorted(params.items()))
+    return f"cache:{name}?{args}"
+
+
+async def cache_get(key: str) -> Optional[Dict[str, Any]]:
+    try:
+        raw = await get_redis().hgetall(key)
+    except (RedisError, OSError):
+        # Redis niedostępny – działamy bez cache
+        return None
+    if not raw or "body" not in raw:
+        return None
+    return {
+        "body": orjson.loads(raw["body"]),
+        "expires_at": float(raw.get("expires_at") or 0),
+        "stale_at": float(raw.get("stale_at") or 0),
+    }
+
+
+async def cache_set(key: str, body: Any, ttl: int) -> None:
+    now = time.time()
+    payload = orjson.dumps(body)
+    mapping = {
+        "body": payload,
+        "expires_at": now + ttl,
+        "stale_at": now + settings.CACHE_STALE_TTL,
+    }
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, max(ttl, settings.CACHE_STALE_TTL))
+        await pipe.execute()
+    except (RedisError, OSError):
+        pass
+
+
+async def cached(
+    key: str,
+    ttl: int,
+    producer: Callable[[], Awaitable[Any]],
+    fallback_on: Tuple[Type[BaseException], ...] = (),
+    is_empty: Optional[Callable[[Any], bool]] = None,
+) -> Any:
+    entry = await cache_get(key)
+    now = time.time()
+    if entry and entry["expires_at"] > now:
+        return entry["body"]
+    try:
+        body = await producer()
+    except fallback_on:
+        # źródło padło – oddaj ostatni (nieświeży) wpis, jeśli jeszcze go mamy
+        if entry and entry["stale_at"] > now:
+            return entry["body"]
+        raise
+    # pusty wynik (np. wszystkie strony szczegółów padły) nie nadpisuje ostatniego dobrego wpisu
+    if entry and is_empty is not None and is_empty(body):
+        return body
+    await cache_set(key, body, ttl)
+    return body
+
+
+# Surowe strony z awwwards razem z walidatorami HTTP (ETag / Last-Modified) do warunkowych GET-ów.
+async def upstream_get(url: str) -> Optional[Dict[str, str]]:
+    try:
+        raw = await get_redis().hgetall(f"upstream:{url}")
+    except (RedisError, OSError):
+        return None
+    if not raw or "body" not in raw or not (raw.get("etag") or raw.get("last_modified")):
+        return None
+    return raw
+
+
+async def upstream_set(url: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+    key = f"upstream:{url}"
+    mapping = {"body": body, "etag": etag or "", "last_modified": last_modified or ""}
+    try:
+        pipe = get_redis().pipeline()
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, settings.CACHE_STALE_TTL)
+        await pipe.execute()
+    except (RedisError, OSError):
+        pass
@@ -5,6 +5,11 @@ class Settings(BaseSettings):
     VERSION: str = "0.1.0"
     SOURCE_URL: str = "https://www.awwwards.com/jobs/"
     REQUEST_TIMEOUT: float = 20.0
+    MAX_CONCURRENT_FETCHES: int = 20  # równoległe pobrania z awwwards na cały proces
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_TTL_LIST: int = 60      # sekundy – strony listy
+    CACHE_TTL_DETAIL: int = 600   # sekundy – strony szczegółów
+    CACHE_STALE_TTL: int = 86400  # jak długo trzymamy wpis jako fallback przy awarii źródła
 
     class Config:
         env_file = ".env"
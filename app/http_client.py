@@ -0,0 +1,47 @@
+from typing import Optional
+import asyncio
+
+import httpx
+
+from .config import settings
+
+USER_AGENT = "Mozilla/5.0 (compatible; AwwwardsJobsBot/0.1; +https://example.com/bot)"
+
+# Jeden klient na proces – pula połączeń (keep-alive) współdzielona przez wszystkie requesty
+_client: Optional[httpx.AsyncClient] = None
+
+# Globalny limit równoległych pobrań z awwwards (dla wszystkich requestów API naraz).
+# Przy HTTP/2 httpx.Limits ogranicza tylko liczbę socketów – strumienie na jednym połączeniu
+# multipleksuje do limitu serwera (MAX_CONCURRENT_STREAMS), więc sam pool niczego nie ogranicza.
+_fetch_slots: Optional[asyncio.Semaphore] = None
+_fetch_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=settings.REQUEST_TIMEOUT,
+            # HTTP/2 – równoległe pobrania szczegółów multipleksowane na jednym połączeniu TLS
+            http2=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=300),
+            headers={"User-Agent": USER_AGENT},
+        )
+    return _client
+
+
+def fetch_slots() -> asyncio.Semaphore:
+    # semafor jest związany z pętlą zdarzeń – twórz na nowo, jeśli pętla się zmieniła (np. testy)
+    global _fetch_slots, _fetch_slots_loop
+    loop = asyncio.get_running_loop()
+    if _fetch_slots is None or _fetch_slots_loop is not loop:
+        _fetch_slots = asyncio.Semaphore(settings.MAX_CONCURRENT_FETCHES)
+        _fetch_slots_loop = loop
+    return _fetch_slots
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,12 +1,32 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from .http_client import close_client, get_client
+from .scraper import AwwwardsScraper
+from .cache import close_redis
 from .routes import router as api_router
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # jeden scraper na aplikację, ze wstrzykniętym współdzielonym klientem HTTP (patrz routes.get_scraper)
+    app.state.scraper = AwwwardsScraper(client=await get_client())
+    yield
+    # zamknij współdzieloną pulę połączeń HTTP i połączenie z Redis
+    await close_client()
+    await close_redis()
+
+
 app = FastAPI(
     title="awwwards-jobs-scraper",
     version="0.1.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    # serializacja odpowiedzi przez orjson (walidacja response_model zostaje bez zmian)
+    default_response_class=ORJSONResponse,
 )
 
 # CORS – otwarte w dev
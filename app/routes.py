@@ -1,11 +1,25 @@
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Query, Response
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from .config import settings
 from .models import JobsResponse, JobDetails, Meta, ErrorResponse
 from .scraper import AwwwardsScraper, ScrapeError
+from .cache import cache_key, cached
 
 router = APIRouter()
 
+def get_scraper(request: Request) -> AwwwardsScraper:
+    # tworzony raz w lifespan (app/main.py)
+    return request.app.state.scraper
+
+def _posted_at_key(item: dict) -> str:
+    # brak daty = "" – przy -posted_at takie oferty lądują na końcu
+    return item.get("posted_at") or ""
+
+def _no_jobs(body: dict) -> bool:
+    return not body.get("data")
+
 @router.head("/jobs")
 async def head_jobs():
     return Response(status_code=200)
@@ -29,9 +43,10 @@ async def get_jobs(
     country: Optional[str] = None,
     remote: Optional[bool] = None,
     sort: Optional[str] = Query(default=None, pattern="^-?posted_at$"),
+    scraper: AwwwardsScraper = Depends(get_scraper),
 ):
-    scraper = AwwwardsScraper()
-    try:
+
+    async def scrape():
         if include == "list":
             data, meta = await scraper.list_only(page=page, category=category, type_=type, country=country, remote=remote)
         else:
@@ -42,7 +57,7 @@ async def get_jobs(
             reverse = sort.startswith("-")
             key = sort.lstrip("-")
             if key == "posted_at":
-                data.sort(key=lambda x: x.get("posted_at") or "", reverse=reverse)
+                data.sort(key=_posted_at_key, reverse=reverse)
 
         return {
             "meta": {
@@ -54,22 +69,52 @@ async def get_jobs(
             },
             "data": data
         }
+
+    try:
+        key = cache_key("jobs", page=page, include=include, category=category, type=type,
+                        country=country, remote=remote, sort=sort)
+        return await cached(key, settings.CACHE_TTL_LIST, scrape, fallback_on=(ScrapeError,), is_empty=_no_jobs)
     except ScrapeError as e:
         raise HTTPException(status_code=503, detail={"error": "source_unreachable", "message": str(e)})
     except Exception as e:
         raise HTTPException(status_code=500, detail={"error": "scrape_failed", "message": str(e)})
 
+@router.get("/jobs/stream", responses={500: {"model": ErrorResponse}, 503: {"model": ErrorResponse}})
+async def stream_jobs(page: int = Query(default=1, ge=1), scraper: AwwwardsScraper = Depends(get_scraper)):
+    """
+    Szczegóły ofert jako NDJSON (jedna oferta na linię), wysyłane w miarę kończenia pobrań.
+    Kolejność = kolejność ukończenia; meta z listy idzie w nagłówkach X-*.
+    """
+    try:
+        items, meta = await scraper.stream_with_details(page=page)
+    except ScrapeError as e:
+        raise HTTPException(status_code=503, detail={"error": "source_unreachable", "message": str(e)})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail={"error": "scrape_failed", "message": str(e)})
+
+    async def body():
+        async for item in items:
+            yield orjson.dumps(item) + b"\n"
+
+    headers = {"X-Page": str(page), "X-Has-Next": "true" if meta.get("has_next") else "false"}
+    if meta.get("next_page"):
+        headers["X-Next-Page"] = str(meta["next_page"])
+    return StreamingResponse(body(), media_type="application/x-ndjson", headers=headers)
+
 @router.get("/jobs/{id}", response_model=JobDetails, responses={404: {"model": ErrorResponse}})
-async def get_job_by_id(id: str):
-    scraper = AwwwardsScraper()
+async def get_job_by_id(id: str, scraper: AwwwardsScraper = Depends(get_scraper)):
     job_url = f"https://www.awwwards.com/jobs/{id}.html"
-    try:
-        import httpx
-        async with httpx.AsyncClient(timeout=scraper.timeout) as client:
-            details = await scraper.job_details(client, job_url)
+
+    async def scrape():
+        details = await scraper.job_details(scraper.client, job_url)
         if not details or not details.get("title"):
             raise HTTPException(status_code=404, detail={"error": "not_found", "message": f"Job not found: {id}"})
         return details
+
+    try:
+        return await cached(cache_key("job", id=id), settings.CACHE_TTL_DETAIL, scrape, fallback_on=(ScrapeError,))
+    except ScrapeError as e:
+        raise HTTPException(status_code=503, detail={"error": "source_unreachable", "message": str(e)})
     except HTTPException:
         raise
     except Exception as e:
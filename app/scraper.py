@@ -1,156 +1,243 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional, Tuple, Iterable
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Iterable, Iterator
 import asyncio
+import functools
+from contextlib import aclosing
 import re
-import json
 
 import httpx
+import orjson
 from bs4 import BeautifulSoup
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from selectolax.lexbor import LexborHTMLParser
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_exception_type
 
 from .config import settings
+from .http_client import fetch_slots, get_client
+from .cache import upstream_get, upstream_set
 
 JOBS_BASE = "https://www.awwwards.com/jobs/"
 
+# Wyrażenia regularne kompilowane raz, na poziomie modułu
+_JOB_HREF_RE = re.compile(r"/jobs/[^/]+\.html(\?.*)?$")
+_SLUG_RE = re.compile(r"/jobs/([^/?#]+)\.html")
+_WS_RE = re.compile(r"\s+")
+_ISO_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+_PAGE_QS_RE = re.compile(r"[?&]page=(\d+)")
+_TOTAL_RE = re.compile(r"job opportunities", re.I)
+_CONTENT_CLASS_RE = re.compile(r"(job|content)", re.I)
+_LD_RE = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+
 class ScrapeError(Exception):
     pass
 
+def _is_outage(e: httpx.HTTPError) -> bool:
+    # awaria źródła: brak połączenia/timeout albo 5xx / 429 z awwwards (lub CDN); inne 4xx to nie awaria
+    if isinstance(e, httpx.HTTPStatusError):
+        status = e.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(e, httpx.TransportError)
+
+# Ponawiamy tylko błędy przejściowe (sieć/timeout); 4xx/5xx z raise_for_status lecą od razu.
+# Jitter rozsynchronizowuje ponowienia równoległych requestów przy awarii źródła.
+_TRANSIENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout)
+_RETRY_POLICY = dict(
+    reraise=True,
+    wait=wait_exponential_jitter(initial=0.3, max=2.0, jitter=0.5),
+    retry=retry_if_exception_type(_TRANSIENT_ERRORS),
+)
+
+# Czyste funkcje na stringach, wołane kilka razy na ten sam URL w obrębie requestu – stąd cache
+@functools.lru_cache(maxsize=4096)
+def _full_url(href: str) -> str:
+    if href.startswith("http"):
+        return href
+    if href.startswith("/"):
+        return "https://www.awwwards.com" + href
+    return JOBS_BASE + href
+
+@functools.lru_cache(maxsize=4096)
+def _slug_from_url(url: str) -> str:
+    # https://www.awwwards.com/jobs/ux-strategist-lewiston.html -> ux-strategist-lewiston
+    m = _SLUG_RE.search(url)
+    return m.group(1) if m else url.rstrip("/").split("/")[-1]
+
 class AwwwardsScraper:
-    def __init__(self, base_url: str | None = None, timeout: float | None = None, concurrency: int = 5):
+    def __init__(self, base_url: str | None = None, timeout: float | None = None,
+                 client: httpx.AsyncClient | None = None, workers: int = 8):
         self.base_url = (base_url or settings.SOURCE_URL).rstrip("/") + "/"
         self.timeout = timeout or settings.REQUEST_TIMEOUT
-        self._sem = asyncio.Semaphore(concurrency)
-
-    @retry(
-        reraise=True,
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=0.6, min=0.6, max=4),
-        retry=retry_if_exception_type(httpx.HTTPError),
-    )
-    async def _get_text(self, client: httpx.AsyncClient, url: str) -> str:
-        async with self._sem:
-            r = await client.get(url, headers={
-                "User-Agent": "Mozilla/5.0 (compatible; AwwwardsJobsBot/0.1; +https://example.com/bot)"
-            })
+        self.client = client
+        self.workers = workers
+
+    async def _client(self) -> httpx.AsyncClient:
+        # domyślnie współdzielony klient z puli (app/http_client.py)
+        return self.client or await get_client()
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str, headers: Dict[str, str] | None = None) -> httpx.Response:
+        # limit równoległości trzyma globalny semafor z app/http_client.py (wspólny dla całego procesu)
+        async with fetch_slots():
+            r = await client.get(url, timeout=self.timeout, headers=headers)
+        if r.status_code != 304:
             r.raise_for_status()
-            return r.text
+        return r
 
-    def _full_url(self, href: str) -> str:
-        if href.startswith("http"):
-            return href
-        if href.startswith("/"):
-            return "https://www.awwwards.com" + href
-        return JOBS_BASE + href
+    @retry(stop=stop_after_attempt(3), **_RETRY_POLICY)
+    async def _get(self, client: httpx.AsyncClient, url: str,
+                   etag: str | None = None, last_modified: str | None = None) -> httpx.Response:
+        # warunkowy GET – przy 304 treść bierze wołający z własnego cache
+        headers: Dict[str, str] = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return await self._fetch(client, url, headers=headers)
 
-    def _slug_from_url(self, url: str) -> str:
-        # https://www.awwwards.com/jobs/ux-strategist-lewiston.html -> ux-strategist-lewiston
-        m = re.search(r"/jobs/([^/?#]+)\.html", url)
-        return m.group(1) if m else url.rstrip("/").split("/")[-1]
+    @retry(stop=stop_after_attempt(2), **_RETRY_POLICY)
+    async def _get_detail_text(self, client: httpx.AsyncClient, url: str) -> str:
+        # strona szczegółów – mniej prób, brak pojedynczej oferty na liście jest akceptowalny
+        return (await self._fetch(client, url)).text
+
+    async def _get_list_html(self, client: httpx.AsyncClient, url: str) -> str:
+        # strona listy: pamiętamy ETag/Last-Modified z awwwards i przy 304 oddajemy zapisany HTML
+        cached_page = await upstream_get(url) or {}
+        r = await self._get(client, url, etag=cached_page.get("etag"), last_modified=cached_page.get("last_modified"))
+        if r.status_code == 304 and cached_page:
+            return cached_page["body"]
+        etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        if etag or last_modified:
+            await upstream_set(url, r.text, etag, last_modified)
+        return r.text
 
     # ---------- LIST PAGE ----------
-    async def list_page(self, page: int = 1, **filters) -> Tuple[str, Dict[str, Any]]:
+    async def list_page(self, page: int = 1, **filters) -> Tuple[LexborHTMLParser, Dict[str, Any]]:
         # Na MVP wspieramy tylko page (filtry dołożymy później).
         url = self.base_url if page == 1 else f"{self.base_url}?page={page}"
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            html = await self._get_text(client, url)
+        client = await self._client()
+        try:
+            html = await self._get_list_html(client, url)
+        except httpx.HTTPError as e:
+            if not _is_outage(e):
+                raise
+            raise ScrapeError(f"Cannot fetch {url}: {e}") from e
 
-        soup = BeautifulSoup(html, "html.parser")
+        # drzewo parsujemy tylko raz – dalej korzystają z niego list_only / list_with_details
+        tree = LexborHTMLParser(html)
 
         # has_next / next_page
         has_next, next_page = False, None
         # typowa paginacja – link z tekstem "Next" lub rel="next"
-        next_a = soup.find("a", string=re.compile(r"^\s*Next\s*$", re.I)) or soup.find("a", rel="next")
-        if next_a and next_a.get("href"):
+        next_a = tree.css_first('a[rel~="next"]') or next(
+            (a for a in tree.css("a") if a.text(strip=True).lower() == "next"), None
+        )
+        next_href = next_a.attributes.get("href") if next_a else None
+        if next_href:
             has_next = True
             # spróbuj wyciągnąć numer ze ścieżki
-            m = re.search(r"[?&]page=(\d+)", next_a["href"])
+            m = _PAGE_QS_RE.search(next_href)
             next_page = int(m.group(1)) if m else page + 1
 
         # "X job opportunities waiting." (jeśli dostępne)
         total_text = None
-        total_el = soup.find(string=re.compile(r"job opportunities", re.I))
-        if total_el:
-            total_text = total_el.strip()
+        for node in tree.css("body *"):
+            text = node.text(deep=False)
+            if text and _TOTAL_RE.search(text):
+                total_text = text.strip()
+                break
 
         meta = {
             "has_next": has_next,
             "next_page": next_page,
             "total_text": total_text,
         }
-        return html, meta
+        return tree, meta
 
-    def _extract_job_urls_from_list(self, html: str) -> List[str]:
-        soup = BeautifulSoup(html, "html.parser")
-        urls: List[str] = []
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
+    def _extract_job_links_from_list(self, tree: LexborHTMLParser) -> List[Tuple[str, str]]:
+        # jedno przejście po <a href>: (url, tytuł), bez duplikatów, w kolejności wystąpienia
+        links: Dict[str, str] = {}
+        for node in tree.css("a[href]"):
+            href = node.attributes.get("href") or ""
             # heurystyka: wszystkie linki do /jobs/*.html
-            if re.search(r"/jobs/[^/]+\.html(\?.*)?$", href):
-                full = self._full_url(href)
-                urls.append(full)
-        # dedupe zachowując kolejność
-        seen = set()
-        uniq = []
-        for u in urls:
-            if u not in seen:
-                uniq.append(u)
-                seen.add(u)
-        return uniq
+            if _JOB_HREF_RE.search(href):
+                full = _full_url(href)
+                # ten sam URL bywa podlinkowany kilka razy (np. logo + tytuł) – bierz pierwszy niepusty tekst
+                if not links.get(full):
+                    links[full] = node.text(strip=True)
+        return list(links.items())
+
+    def _extract_job_urls_from_list(self, tree: LexborHTMLParser) -> List[str]:
+        return [u for u, _ in self._extract_job_links_from_list(tree)]
 
     # ---------- DETAILS PAGE ----------
-    def _first_json(self, s: str) -> Optional[dict]:
+    def _json_objects(self, s: str) -> Iterator[dict]:
+        # kandydaci z jednego bloku JSON-LD: sam obiekt albo kolejne słowniki z listy top-level
         try:
-            data = json.loads(s)
-            if isinstance(data, dict):
-                return data
-            if isinstance(data, list):
-                # weź pierwszy słownik
-                for item in data:
-                    if isinstance(item, dict):
-                        return item
-        except Exception:
-            return None
-        return None
+            data = orjson.loads(s)
+        except orjson.JSONDecodeError:
+            return
+        if isinstance(data, dict):
+            yield data
+        elif isinstance(data, list):
+            for item in data:
+                if isinstance(item, dict):
+                    yield item
 
     def _pick_jobposting(self, scripts: Iterable[str]) -> Optional[dict]:
         for s in scripts:
-            data = self._first_json(s)
-            if not isinstance(data, dict):
+            # tani test na surowym tekście – pomija Organization/BreadcrumbList itp. bez dekodowania
+            if "JobPosting" not in s:
                 continue
-            # Bezpośrednio JobPosting
-            if data.get("@type") == "JobPosting":
-                return data
-            # Albo w grafie
-            graph = data.get("@graph")
-            if isinstance(graph, list):
-                for node in graph:
-                    if isinstance(node, dict) and node.get("@type") == "JobPosting":
-                        return node
+            for data in self._json_objects(s):
+                root_type = data.get("@type")
+                # Bezpośrednio JobPosting
+                if root_type == "JobPosting":
+                    return data
+                # Albo w grafie – @graph występuje tylko w kontenerach bez własnego @type
+                if root_type is None:
+                    graph = data.get("@graph")
+                    if isinstance(graph, list):
+                        for node in graph:
+                            if isinstance(node, dict) and node.get("@type") == "JobPosting":
+                                return node
         return None
 
     def _clean_text(self, x: Optional[str]) -> Optional[str]:
         if x is None:
             return None
-        return re.sub(r"\s+", " ", str(x)).strip() or None
+        return _WS_RE.sub(" ", str(x)).strip() or None
 
     def _norm_date(self, d: Optional[str]) -> Optional[str]:
         # jeśli datePosted w ISO, to utnij do YYYY-MM-DD
         if not d:
             return None
-        m = re.match(r"(\d{4}-\d{2}-\d{2})", d)
+        m = _ISO_DATE_RE.match(d)
         if m:
             return m.group(1)
         return d  # zostaw jak jest, jeśli nie rozpoznajemy
 
     async def job_details(self, client: httpx.AsyncClient, job_url: str) -> Dict[str, Any]:
-        html = await self._get_text(client, job_url)
-        soup = BeautifulSoup(html, "html.parser")
-
-        # 1) JSON-LD JobPosting – najpewniejsze
-        ld_scripts = [tag.get_text(strip=False) for tag in soup.find_all("script", type="application/ld+json")]
+        try:
+            html = await self._get_detail_text(client, job_url)
+        except httpx.HTTPError as e:
+            if not _is_outage(e):
+                raise
+            raise ScrapeError(f"Cannot fetch {job_url}: {e}") from e
+        # 1) JSON-LD JobPosting – najpewniejsze; wyciągane regexem z surowego HTML, bez budowania drzewa
+        ld_scripts = _LD_RE.findall(html)
         job = self._pick_jobposting(ld_scripts) or {}
 
-        title = self._clean_text(job.get("title")) or self._clean_text((soup.find("h1") or {}).get_text() if soup.find("h1") else None)
+        # pełne drzewo DOM budujemy dopiero, gdy JSON-LD nie wystarcza (fallbacki niżej)
+        soup: Optional[BeautifulSoup] = None
+
+        def dom() -> BeautifulSoup:
+            nonlocal soup
+            if soup is None:
+                soup = BeautifulSoup(html, "lxml")
+            return soup
+
+        title = self._clean_text(job.get("title"))
+        if not title:
+            h1 = dom().find("h1")
+            title = self._clean_text(h1.get_text()) if h1 else None
         org = job.get("hiringOrganization") or {}
         company_name = self._clean_text(org.get("name"))
         company_website = self._clean_text(org.get("sameAs") or org.get("url"))
@@ -158,9 +245,11 @@ class AwwwardsScraper:
         apply_url = self._clean_text(job.get("hiringOrganization", {}).get("url") or job.get("applicationContact") or job.get("url"))
         # Jeżeli nie ma w JSON-LD, spróbuj anchor z tekstem "More info" lub "Apply"
         if not apply_url:
-            anchor = soup.find("a", string=re.compile(r"(More info|Apply)", re.I))
-            if anchor and anchor.get("href"):
-                apply_url = self._full_url(anchor["href"])
+            for anchor in dom().find_all("a", href=True):
+                label = anchor.get_text(strip=True).lower()
+                if label.startswith(("more info", "apply")):
+                    apply_url = _full_url(anchor["href"])
+                    break
 
         # Lokalizacja / kraj
         country = None
@@ -190,16 +279,17 @@ class AwwwardsScraper:
         # plain text fallback
         description_text = None
         if description_html:
-            # usuń znaczniki w prosty sposób
-            description_text = BeautifulSoup(description_html, "html.parser").get_text(separator=" ").strip()
+            # usuń znaczniki – Lexbor jest tu dużo tańszy niż pełne drzewo BeautifulSoup
+            body = LexborHTMLParser(description_html).body
+            description_text = body.text(separator=" ").strip() if body else None
         else:
             # fallback: główna treść strony (ostrożnie)
-            article = soup.find("article") or soup.find("div", class_=re.compile(r"(job|content)", re.I))
+            article = dom().find("article") or dom().find("div", class_=_CONTENT_CLASS_RE)
             if article:
                 description_text = article.get_text(separator=" ").strip()
 
         item = {
-            "id": self._slug_from_url(job_url),
+            "id": _slug_from_url(job_url),
             "title": title or "",
             "company_name": company_name,
             "company_website": company_website,
@@ -218,39 +308,84 @@ class AwwwardsScraper:
         return item
 
     async def list_with_details(self, page: int = 1, **filters) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-        html, meta = await self.list_page(page=page, **filters)
-        job_urls = self._extract_job_urls_from_list(html)
+        tree, meta = await self.list_page(page=page, **filters)
+        job_urls = self._extract_job_urls_from_list(tree)
         if not job_urls:
             return [], meta
 
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            results = await asyncio.gather(*[self.job_details(client, url) for url in job_urls], return_exceptions=True)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(job_urls)
+        async with aclosing(self._iter_indexed_details(job_urls)) as done:
+            async for i, item in done:
+                results[i] = item
 
-        data: List[Dict[str, Any]] = []
-        for res in results:
-            if isinstance(res, Exception):
-                # Pomijamy pojedyncze błędy (np. jedna strona padła), reszta przejdzie
-                continue
-            data.append(res)
+        data: List[Dict[str, Any]] = [res for res in results if res is not None]
         return data, meta
 
+    async def _iter_indexed_details(self, job_urls: List[str]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        (indeks na liście, szczegóły) w kolejności ukończenia. K workerów bierze URL-e z kolejki
+        i odkłada wyniki do ograniczonej kolejki wyjściowej – w pamięci jest naraz co najwyżej
+        ~2K stron/ofert, a nie wszystkie N.
+        """
+        if not job_urls:
+            return
+        client = await self._client()
+        todo: asyncio.Queue[Tuple[int, str]] = asyncio.Queue()
+        for i, url in enumerate(job_urls):
+            todo.put_nowait((i, url))
+        done: asyncio.Queue[Optional[Tuple[int, Dict[str, Any]]]] = asyncio.Queue(maxsize=self.workers)
+
+        async def worker() -> None:
+            while not todo.empty():
+                i, url = todo.get_nowait()
+                try:
+                    item = await self.job_details(client, url)
+                except Exception:
+                    # Pomijamy pojedyncze błędy (np. jedna strona padła), reszta przejdzie
+                    continue
+                await done.put((i, item))
+            await done.put(None)  # ten worker skończył
+
+        tasks = [asyncio.create_task(worker()) for _ in range(min(self.workers, len(job_urls)))]
+        try:
+            running = len(tasks)
+            while running:
+                res = await done.get()
+                if res is None:
+                    running -= 1
+                    continue
+                yield res
+        finally:
+            # klient mógł się rozłączyć w trakcie streamu – nie zostawiaj wiszących pobrań
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def iter_details(self, job_urls: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Szczegóły ofert w kolejności ukończenia pobrań (nie w kolejności z listy),
+        żeby można było je wysyłać klientowi od razu, bez czekania na najwolniejszą stronę.
+        """
+        async with aclosing(self._iter_indexed_details(job_urls)) as done:
+            async for _, item in done:
+                yield item
+
+    async def stream_with_details(self, page: int = 1, **filters) -> Tuple[AsyncIterator[Dict[str, Any]], Dict[str, Any]]:
+        tree, meta = await self.list_page(page=page, **filters)
+        job_urls = self._extract_job_urls_from_list(tree)
+        return self.iter_details(job_urls), meta
+
     async def list_only(self, page: int = 1, **filters) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
         """
         Opcjonalnie: same dane z listy (bez wejścia w szczegóły).
         Na razie zwracamy tylko URL-e i tytuł jeśli da się pewnie wyciągnąć.
         """
-        html, meta = await self.list_page(page=page, **filters)
-        urls = self._extract_job_urls_from_list(html)
+        tree, meta = await self.list_page(page=page, **filters)
         items = []
-        soup = BeautifulSoup(html, "html.parser")
-        href_to_title: Dict[str, str] = {}
-        for a in soup.find_all("a", href=True):
-            if re.search(r"/jobs/[^/]+\.html(\?.*)?$", a["href"]):
-                href_to_title[self._full_url(a["href"])] = a.get_text(strip=True)
-        for u in urls:
+        for u, title in self._extract_job_links_from_list(tree):
             items.append({
-                "id": self._slug_from_url(u),
-                "title": href_to_title.get(u) or "",
+                "id": _slug_from_url(u),
+                "title": title or "",
                 "awwwards_url": u,
             })
         return items, meta
@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app import cache
+from app.cache import cache_get, cache_set, cached
+from app.scraper import AwwwardsScraper, ScrapeError
+
+LIST_URL = "https://www.awwwards.com/jobs/"
+
+
+class FakeRedis:
+    """Minimalny zamiennik redis.asyncio (decode_responses=True) – tylko to, czego używa app/cache.py."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def hset(self, key, mapping):
+        self.ops.append((key, mapping))
+
+    def expire(self, key, ttl):
+        pass
+
+    async def execute(self):
+        for key, mapping in self.ops:
+            h = self.redis.hashes.setdefault(key, {})
+            for k, v in mapping.items():
+                h[k] = v.decode() if isinstance(v, bytes) else str(v)
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    r = FakeRedis()
+    monkeypatch.setattr(cache, "_redis", r)
+    return r
+
+
+def list_html(n):
+    return "".join(f'<a href="/jobs/job-{i}.html">Job {i}</a>' for i in range(n))
+
+
+def detail_html(title):
+    return f'<script type="application/ld+json">{{"@type": "JobPosting", "title": "{title}"}}</script>'
+
+
+def make_scraper(handler, **kwargs):
+    return AwwwardsScraper(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_list_page_304_serves_stored_body(fake_redis):
+    fake_redis.hashes[f"upstream:{LIST_URL}"] = {"body": list_html(2), "etag": '"v1"', "last_modified": ""}
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        return httpx.Response(304)
+
+    scraper = make_scraper(handler)
+    tree, _ = await scraper.list_page()
+    links = scraper._extract_job_urls_from_list(tree)
+
+    assert seen == ['"v1"']
+    assert links == [f"{LIST_URL}job-0.html", f"{LIST_URL}job-1.html"]
+
+
+@pytest.mark.asyncio
+async def test_list_page_stores_validators(fake_redis):
+    def handler(request):
+        return httpx.Response(200, text=list_html(1), headers={"ETag": '"v2"'})
+
+    await make_scraper(handler).list_page()
+
+    stored = fake_redis.hashes[f"upstream:{LIST_URL}"]
+    assert stored["etag"] == '"v2"'
+    assert stored["body"] == list_html(1)
+
+
+@pytest.mark.asyncio
+async def test_fresh_cache_hit_skips_producer():
+    await cache_set("cache:test", {"data": [1]}, ttl=60)
+
+    async def producer():
+        raise AssertionError("scraper should not run on a fresh hit")
+
+    assert await cached("cache:test", 60, producer) == {"data": [1]}
+
+
+@pytest.mark.asyncio
+async def test_scrape_error_serves_stale_entry(fake_redis):
+    await cache_set("cache:test", {"data": [1]}, ttl=60)
+    fake_redis.hashes["cache:test"]["expires_at"] = str(time.time() - 1)
+
+    async def producer():
+        raise ScrapeError("source down")
+
+    assert await cached("cache:test", 60, producer, fallback_on=(ScrapeError,)) == {"data": [1]}
+
+
+@pytest.mark.asyncio
+async def test_empty_result_does_not_overwrite_entry(fake_redis):
+    await cache_set("cache:test", {"data": [1]}, ttl=60)
+    fake_redis.hashes["cache:test"]["expires_at"] = str(time.time() - 1)
+
+    async def producer():
+        return {"data": []}
+
+    await cached("cache:test", 60, producer, is_empty=lambda body: not body["data"])
+
+    assert (await cache_get("cache:test"))["body"] == {"data": [1]}
+
+
+@pytest.mark.asyncio
+async def test_upstream_5xx_raises_scrape_error():
+    def handler(request):
+        return httpx.Response(503)
+
+    with pytest.raises(ScrapeError):
+        await make_scraper(handler).list_page()
+
+
+@pytest.mark.asyncio
+async def test_list_with_details_keeps_order_and_drops_failures():
+    async def handler(request):
+        if request.url.path == "/jobs/":
+            return httpx.Response(200, text=list_html(6))
+        n = int(request.url.path.rsplit("-", 1)[1].split(".")[0])
+        # późniejsze oferty kończą się szybciej – kolejność ukończenia != kolejność z listy
+        await asyncio.sleep((6 - n) * 0.01)
+        if n == 2:
+            return httpx.Response(404)
+        return httpx.Response(200, text=detail_html(f"Title {n}"))
+
+    data, _ = await make_scraper(handler, workers=3).list_with_details()
+
+    assert [d["title"] for d in data] == ["Title 0", "Title 1", "Title 3", "Title 4", "Title 5"]
+    assert [d["id"] for d in data] == ["job-0", "job-1", "job-3", "job-4", "job-5"]